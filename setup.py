@@ -33,7 +33,8 @@ setup(
         zip_safe = False,
         install_requires=['pandas', 'ratelimit', 'cachetools', 'requests'],
         extras_require={
-            "dev": []},
+            "dev": [],
+            "export": ["pyarrow"]},
         classifiers=[
             'Development Status :: 3 - Alpha',
             'Intended Audience :: Developers',
@@ -1,6 +1,9 @@
 import requests
 import urllib3
 import os
+import json
+import glob
+import re
 
 import pandas as pd
 import ratelimit
@@ -27,6 +30,8 @@ class OpenFigiClient:
             'securityType', 'marketSector', 'shareClassFIGI',
             'securityType2', 'securityDescription']
 
+    _EXPORT_PART_RE = re.compile(r'^_?part-(\d{5})\.(parquet|arrow)$')
+
     # }}}
 
     def __init__(self, api_key=None, **kwargs):# {{{
@@ -42,6 +47,7 @@ class OpenFigiClient:
         self.kwargs = kwargs 
         self._mapping_job_limit = 10
         self._search_filter_result_limit = 100
+        self._export_row_group_size = 10000
         # }}}
 
     def connect(self):# {{{
@@ -376,23 +382,39 @@ class OpenFigiClient:
             data_dict.update(kwargs)
         return data_dict# }}}
 
-    def _search_filter_pagnation(self, query='', typ='search', result_limit=100, **kwargs):# {{{
-        js = self._build_search_filter_request(query=query, typ=typ, start=None, **kwargs)
+    def _search_filter_pages(self, query='', typ='search', result_limit=100, start=None,
+            raise_errors=False, **kwargs):# {{{
+        """yield each page of results along with the cursor for the page after it.
+        The cursor is `None` once there are no more pages or `result_limit` is hit.
+        With `raise_errors` an error response raises a `ValueError` rather than
+        ending the pagination"""
+        js = self._build_search_filter_request(query=query, typ=typ, start=start, **kwargs)
         result = self._send_search_filter_request(js, typ=typ)
 
         tot = 0
 
-        while 'data' in result and len(result['data']):
-            for part in result['data']:
-                yield part
-                tot += 1
-                if tot >= result_limit:
-                    break
+        while True:
+            if raise_errors and 'error' in result:
+                raise ValueError('Open FIGI API returned an error: {}'.format(result['error']))
+            if not ('data' in result and len(result['data'])):
+                break
+            page = result['data'][:result_limit - tot]
+            tot += len(page)
             if ('next' in result) and tot < result_limit:
-                js = self._build_search_filter_request(query=query, typ=typ, start=result['next'], **kwargs)
-                result = self._send_search_filter_request(js, typ=typ)
+                next_start = result['next']
             else:
-                break# }}}
+                next_start = None
+            yield page, next_start
+            if next_start is None:
+                break
+            js = self._build_search_filter_request(query=query, typ=typ, start=next_start, **kwargs)
+            result = self._send_search_filter_request(js, typ=typ)# }}}
+
+    def _search_filter_pagnation(self, query='', typ='search', result_limit=100, **kwargs):# {{{
+        pages = self._search_filter_pages(query=query, typ=typ, result_limit=result_limit, **kwargs)
+        for page, _ in pages:
+            for part in page:
+                yield part# }}}
 
     def search(self, query, result_limit=100, **kwargs):# {{{
         """Search the Open FIGI API for a given query
@@ -444,3 +466,194 @@ class OpenFigiClient:
         for i, result in enumerate(gen_results):
             results.append(result)
         return pd.DataFrame(results, columns=self.ALL_COLS)# }}}
+
+    def _read_export_state(self, state_path):# {{{
+        """helper method to load the saved cursor of a previous export"""
+        if not os.path.exists(state_path):
+            return None
+
+        with open(state_path) as f:
+            return json.load(f)# }}}
+
+    def _write_export_state(self, state_path, state):# {{{
+        """helper method to save the export cursor, written to a temporary file
+        first so an interruption never leaves a partial state file"""
+        tmp_path = state_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)# }}}
+
+    def _open_export_writer(self, file_path, schema, file_format):# {{{
+        """helper method to open a writer for a single part file, returning the
+        writer and the underlying file (if it needs closing separately)"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if file_format == 'parquet':
+            return pq.ParquetWriter(file_path, schema), None
+
+        sink = pa.OSFile(file_path, 'wb')
+        return pa.ipc.new_file(sink, schema), sink# }}}
+
+    def _remove_export_files(self, path, files, start_index):# {{{
+        """helper method to remove the listed part files of a previous export,
+        along with any part file from `start_index` onwards that was written but
+        not yet recorded in its state"""
+        for file_name in files:
+            file_path = os.path.join(path, file_name)
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+        for file_name in os.listdir(path):
+            match = self._EXPORT_PART_RE.match(file_name)
+            if match and int(match.group(1)) >= start_index:
+                os.remove(os.path.join(path, file_name))# }}}
+
+    def _write_export_rows(self, writer, table):# {{{
+        """helper method to write a buffered table as a single row group
+        (or record batch)"""
+        writer.write_table(table.combine_chunks())# }}}
+
+    def export(self, path, typ='filter', query='', result_limit=100, file_format='parquet',
+            rows_per_file=100000, resume=True, **kwargs):# {{{
+        """Export the results of a search or filter to a directory of Parquet or
+        Arrow IPC files, writing results as they are received so the full result
+        set never has to be held in memory
+
+        Parameters
+        ----------
+        path: str
+            The directory to write the files to. Results are written to
+            `part-00000.parquet` (or `.arrow`), `part-00001.parquet` and so on,
+            along with an `_export_state.json` file recording the pagination cursor.
+            A directory that already holds part files not written by `export`
+            raises a `ValueError` rather than being overwritten
+        typ: str
+            One of: filter, search
+        query: str
+            The text term to search for, only used when `typ` is search
+        result_limit: int
+            The maximum number of results to export
+        file_format: str
+            One of: parquet, arrow. Arrow files are written in the IPC file format
+            and can be memory mapped with `pyarrow.memory_map`
+        rows_per_file: int
+            Once a part file holds at least this many rows it is closed and a new
+            one started
+        resume: bool
+            If the directory holds an export of the same request, carry on from
+            the last part file written. A finished export is returned as it is
+            without calling the API, so use `resume=False` to refresh it. A
+            directory holding an export of a different request raises a
+            `ValueError` unless `resume=False`. With `resume=False` the part files
+            of any previous export in the directory are removed first
+        kwargs
+            Additional arguments provided to the Open FIGI API as part of the data object.
+            Refer to the documentation for the list of possible values
+
+        Returns
+        -------
+        files: list
+            The paths of all the files making up the export
+        """
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError('pyarrow is required to export results, '
+                    'install it with `pip install openfigipy[export]`')
+
+        assert typ in ('search', 'filter')
+        assert file_format in ('parquet', 'arrow')
+        assert rows_per_file > 0
+
+        request = {'typ': typ, 'query': query if typ == 'search' else None,
+                'result_limit': result_limit, 'file_format': file_format,
+                'rows_per_file': rows_per_file, 'kwargs': kwargs}
+        # round trip through json so the request compares equal to the saved
+        # state, and fails on unserialisable kwargs before anything is written
+        request = json.loads(json.dumps(request))
+
+        os.makedirs(path, exist_ok=True)
+        state_path = os.path.join(path, '_export_state.json')
+
+        state = self._read_export_state(state_path)
+
+        if state is None:
+            if glob.glob(os.path.join(path, 'part-*')):
+                raise ValueError('{} already contains part files that were not written by '
+                        'export, use a new directory'.format(path))
+        elif not resume:
+            self._remove_export_files(path, state['files'], len(state['files']))
+            state = None
+        elif state['request'] != request:
+            raise ValueError('{} contains an export for a different request, '
+                    'use a new directory or set resume=False'.format(path))
+        else:
+            # part files renamed into place before the state recording them was saved
+            self._remove_export_files(path, [], len(state['files']))
+
+        if state is None:
+            state = {'request': request, 'next': None, 'rows': 0, 'files': [], 'complete': False}
+            self._write_export_state(state_path, state)
+
+        if not state['complete']:
+            schema = pa.schema([(col, pa.string()) for col in self.ALL_COLS])
+            row_group_size = self._export_row_group_size
+
+            pages = self._search_filter_pages(query=query, typ=typ,
+                    result_limit=result_limit - state['rows'], start=state['next'],
+                    raise_errors=True, **kwargs)
+
+            next_start = state['next']
+            writer = None
+
+            try:
+                for page, next_start in pages:
+                    if writer is None:
+                        file_name = 'part-{:05d}.{}'.format(len(state['files']), file_format)
+                        tmp_path = os.path.join(path, '_' + file_name)
+                        writer, sink = self._open_export_writer(tmp_path, schema, file_format)
+                        part_rows = 0
+                        buffer = schema.empty_table()
+
+                    table = pa.Table.from_pandas(pd.DataFrame(page, columns=self.ALL_COLS),
+                            schema=schema, preserve_index=False)
+                    buffer = pa.concat_tables([buffer, table])
+                    part_rows += table.num_rows
+
+                    # pages are buffered so each row group holds `row_group_size` rows
+                    while buffer.num_rows >= row_group_size:
+                        self._write_export_rows(writer, buffer.slice(0, row_group_size))
+                        buffer = buffer.slice(row_group_size)
+
+                    if part_rows >= rows_per_file or next_start is None:
+                        if buffer.num_rows:
+                            self._write_export_rows(writer, buffer)
+                        writer.close()
+                        if sink is not None:
+                            sink.close()
+                        writer = None
+                        os.replace(tmp_path, os.path.join(path, file_name))
+
+                        state['files'].append(file_name)
+                        state['rows'] += part_rows
+                        state['next'] = next_start
+                        state['complete'] = next_start is None
+                        self._write_export_state(state_path, state)
+            finally:
+                # an unfinished part file is discarded, resuming fetches
+                # its pages again from the last saved cursor
+                if writer is not None:
+                    writer.close()
+                    if sink is not None:
+                        sink.close()
+                    os.remove(tmp_path)
+
+            if next_start is not None:
+                raise ValueError('The Open FIGI API stopped returning results before the '
+                        'last page, run the export again to resume')
+
+            state['complete'] = True
+            self._write_export_state(state_path, state)
+
+        return [os.path.join(path, x) for x in state['files']]# }}}
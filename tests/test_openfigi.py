@@ -5,6 +5,11 @@ from openfigipy import OpenFigiClient
 
 import requests
 import pandas as pd
+import pytest
+import datetime
+import json
+import os
+import shutil
 
 def test_connect():# {{{
     ofc = OpenFigiClient()
@@ -41,3 +46,160 @@ def test_search():# {{{
     res = ofc.search('IBM', exchCode='US', marketSecDes='Equity', result_limit=1)
     assert res['securityType'].iloc[0] == 'Common Stock'
     assert res['securityType'].iloc[0] == 'Common Stock'# }}}
+
+def _fake_filter_pages(n_pages, page_size, fail_on=()):# {{{
+    """build a fake `_send_search_filter_request` that serves `n_pages` pages,
+    recording the cursor of each call and returning an error response once
+    for each cursor in `fail_on`"""
+    fail_on = list(fail_on)
+    calls = []
+
+    def send(js, typ='search'):
+        calls.append(js.get('start'))
+        if js.get('start') in fail_on:
+            fail_on.remove(js.get('start'))
+            return {'error': 'Too many requests'}
+        page = int(js.get('start', 0))
+        data = [{'figi': 'BBG{:09d}'.format(page * page_size + i), 'name': 'X'}
+                for i in range(page_size)]
+        result = {'data': data}
+        if page + 1 < n_pages:
+            result['next'] = str(page + 1)
+        return result
+
+    send.calls = calls
+    return send# }}}
+
+def test_export(tmp_path, monkeypatch):# {{{
+    pq = pytest.importorskip('pyarrow.parquet')
+
+    client = OpenFigiClient()
+    monkeypatch.setattr(client, '_send_search_filter_request', _fake_filter_pages(4, 10))
+
+    files = client.export(str(tmp_path), exchCode='US', result_limit=35, rows_per_file=20)
+    assert len(files) == 2
+    assert [pq.ParquetFile(f).num_row_groups for f in files] == [1, 1]
+    res = pq.read_table(str(tmp_path), memory_map=True).to_pandas()
+    assert res.shape[0] == 35
+    assert res.columns.tolist() == client.ALL_COLS
+    assert res['figi'].is_unique# }}}
+
+def test_export_clears_previous_parts(tmp_path, monkeypatch):# {{{
+    pq = pytest.importorskip('pyarrow.parquet')
+
+    client = OpenFigiClient()
+    monkeypatch.setattr(client, '_send_search_filter_request', _fake_filter_pages(4, 10))
+    client.export(str(tmp_path), exchCode='US', rows_per_file=10)
+
+    monkeypatch.setattr(client, '_send_search_filter_request', _fake_filter_pages(1, 10))
+    files = client.export(str(tmp_path), exchCode='LN', rows_per_file=10, resume=False)
+    assert len(files) == 1
+    assert pq.read_table(str(tmp_path)).num_rows == 10
+
+    assert sorted(os.listdir(str(tmp_path))) == ['_export_state.json', 'part-00000.parquet']# }}}
+
+def test_export_refuses_foreign_parts(tmp_path, monkeypatch):# {{{
+    pytest.importorskip('pyarrow')
+
+    client = OpenFigiClient()
+    monkeypatch.setattr(client, '_send_search_filter_request', _fake_filter_pages(1, 10))
+
+    (tmp_path / 'part-00000-abc.snappy.parquet').write_bytes(b'spark')
+    for resume in (True, False):
+        with pytest.raises(ValueError):
+            client.export(str(tmp_path), exchCode='US', resume=resume)
+    assert os.listdir(str(tmp_path)) == ['part-00000-abc.snappy.parquet']# }}}
+
+def test_export_row_groups(tmp_path, monkeypatch):# {{{
+    pq = pytest.importorskip('pyarrow.parquet')
+
+    client = OpenFigiClient()
+    monkeypatch.setattr(client, '_send_search_filter_request', _fake_filter_pages(50, 100))
+    files = client.export(str(tmp_path / 'default'), exchCode='US', result_limit=5000)
+    assert [pq.ParquetFile(f).num_row_groups for f in files] == [1]
+
+    client._export_row_group_size = 15
+    files = client.export(str(tmp_path / 'small'), exchCode='US', result_limit=40)
+    meta = pq.ParquetFile(files[0]).metadata
+    assert [meta.row_group(i).num_rows for i in range(meta.num_row_groups)] == [15, 15, 10]# }}}
+
+def test_export_resume(tmp_path, monkeypatch):# {{{
+    pa = pytest.importorskip('pyarrow')
+
+    client = OpenFigiClient()
+    send = _fake_filter_pages(3, 10, fail_on=['1'])
+    monkeypatch.setattr(client, '_send_search_filter_request', send)
+
+    kwargs = {'exchCode': 'US', 'securityType2': ('Common Stock',)}
+    with pytest.raises(ValueError):
+        client.export(str(tmp_path), file_format='arrow', rows_per_file=20, **kwargs)
+    # the open part file is discarded, only the cursor of the closed part is kept
+    assert sorted(os.listdir(str(tmp_path))) == ['_export_state.json']
+
+    del send.calls[:]
+    files = client.export(str(tmp_path), file_format='arrow', rows_per_file=20, **kwargs)
+    assert send.calls == [None, '1', '2']
+    assert len(files) == 2
+
+    figis = []
+    for f in files:
+        with pa.memory_map(f) as source:
+            figis.extend(pa.ipc.open_file(source).read_all().column('figi').to_pylist())
+    assert figis == ['BBG{:09d}'.format(i) for i in range(30)]
+
+    # a finished export is not requested again
+    del send.calls[:]
+    assert client.export(str(tmp_path), file_format='arrow', rows_per_file=20, **kwargs) == files
+    assert send.calls == []
+
+    with pytest.raises(ValueError):
+        client.export(str(tmp_path), file_format='arrow', rows_per_file=20, exchCode='LN')# }}}
+
+def test_export_resume_after_error(tmp_path, monkeypatch):# {{{
+    pq = pytest.importorskip('pyarrow.parquet')
+
+    client = OpenFigiClient()
+    send = _fake_filter_pages(3, 10, fail_on=['2'])
+    monkeypatch.setattr(client, '_send_search_filter_request', send)
+
+    with pytest.raises(ValueError):
+        client.export(str(tmp_path), exchCode='US', securityType2=['Common Stock'], rows_per_file=10)
+    with open(str(tmp_path / '_export_state.json')) as f:
+        state = json.load(f)
+    assert state['complete'] is False
+    assert state['next'] == '2'
+    assert state['rows'] == 20
+
+    del send.calls[:]
+    files = client.export(str(tmp_path), exchCode='US', securityType2=['Common Stock'], rows_per_file=10)
+    assert send.calls == ['2']
+    assert len(files) == 3
+    assert pq.read_table(str(tmp_path)).num_rows == 30# }}}
+
+def test_export_unserialisable_kwargs(tmp_path):# {{{
+    pytest.importorskip('pyarrow')
+
+    client = OpenFigiClient()
+    with pytest.raises(TypeError):
+        client.export(str(tmp_path / 'out'), maturity=[datetime.date(2030, 1, 1), None])
+    assert not os.path.exists(str(tmp_path / 'out'))# }}}
+
+def test_export_resume_removes_unrecorded_parts(tmp_path, monkeypatch):# {{{
+    pq = pytest.importorskip('pyarrow.parquet')
+
+    client = OpenFigiClient()
+    send = _fake_filter_pages(3, 10, fail_on=['2'])
+    monkeypatch.setattr(client, '_send_search_filter_request', send)
+    with pytest.raises(ValueError):
+        client.export(str(tmp_path), exchCode='US', rows_per_file=10)
+
+    # parts renamed into place by an earlier run that died before saving its state
+    for name in ('part-00002.parquet', 'part-00003.parquet'):
+        shutil.copy(str(tmp_path / 'part-00000.parquet'), str(tmp_path / name))
+
+    files = client.export(str(tmp_path), exchCode='US', rows_per_file=10)
+    assert len(files) == 3
+    assert not os.path.exists(str(tmp_path / 'part-00003.parquet'))
+    res = pq.read_table(str(tmp_path)).to_pandas()
+    assert res.shape[0] == 30
+    assert res['figi'].is_unique# }}}